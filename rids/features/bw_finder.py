@@ -8,7 +8,7 @@ def bw_finder(f, v, pts, bw_range):
     bw = []
     df = f[1] - f[0]  # Assumes all the same
     i_off = [int(math.ceil(bw_range[0] / df)), int(math.ceil(bw_range[1] / df))]
-    v_zero = np.array(v) - min(v)
+    v_zero = np.asarray(v) - np.min(v)
     for ipts in pts:
         bw_entry = [0.0, 0.0]
         for k in range(len(bw_entry)):
@@ -1,7 +1,17 @@
 # -*- coding: utf-8 -*-
 from __future__ import print_function, absolute_import, division
 import sys
-from numpy import NaN, Inf, arange, isscalar, asarray, array
+import numpy as np
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        """
+        numba isn't available, so just use the python function.
+        """
+        def decorator(func):
+            return func
+        return decorator
 
 
 def peakdet(v, delta, threshold, x=None):
@@ -30,48 +40,56 @@ def peakdet(v, delta, threshold, x=None):
     % This function is released to the public domain; Any use is allowed.
 
     """
-    thresholded_max_only = []
-    maxtab = []
-    mintab = []
+    v = np.ascontiguousarray(v, dtype=np.float64)
     if x is None:
-        x = arange(len(v))
-    v = asarray(v)
+        x = np.arange(len(v))
+    x = np.asarray(x)
 
     if len(v) != len(x):
         sys.exit('Input vectors v and x must have same length')
 
-    if not isscalar(delta):
+    if not np.isscalar(delta):
         sys.exit('Input argument delta must be a scalar')
 
     if delta <= 0:
         sys.exit('Input argument delta must be positive')
 
-    mn, mx = Inf, -Inf
-    mnpos, mxpos = NaN, NaN
+    if threshold is None:
+        threshold = -np.inf
+
+    return list(x[_peakdet(v, float(delta), float(threshold))])
+
+
+@njit(cache=True, nogil=True)
+def _peakdet(v, delta, threshold):
+    """
+    The peakdet loop (compiled with numba if available), returning the indices of the
+    maxima above threshold.
+    """
+    thresholded_max_only = np.empty(len(v), dtype=np.int64)
+    npk = 0
+    mn, mx = np.inf, -np.inf
+    mxpos = 0
 
     lookformax = True
 
-    for i in arange(len(v)):
+    for i in range(len(v)):
         this = v[i]
         if this > mx:
             mx = this
-            mxpos = x[i]
+            mxpos = i
         if this < mn:
             mn = this
-            mnpos = x[i]
         if lookformax:
             if this < mx - delta:
-                maxtab.append((mxpos, mx))
                 if mx > threshold:
-                    thresholded_max_only.append(mxpos)
+                    thresholded_max_only[npk] = mxpos
+                    npk += 1
                 mn = this
-                mnpos = x[i]
                 lookformax = False
         else:
             if this > mn + delta:
-                mintab.append((mnpos, mn))
                 mx = this
-                mxpos = x[i]
+                mxpos = i
                 lookformax = True
-    return thresholded_max_only
-    # return array(maxtab), array(mintab)
+    return thresholded_max_only[:npk]
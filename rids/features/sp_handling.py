@@ -67,13 +67,11 @@ class SPHandling:
                                                             self.reconstituted_info.dfill))
             elif self.reconstituted_info.dfill == 'feature_set_min':
                 self.reconstituted_info.dfill = 1E9
-                for mf in rid.feature_sets[feature_key].spectral_fields:
-                    try:
-                        v = min(getattr(rid.feature_sets[feature_key], mf))
-                    except AttributeError:
-                        continue
-                    except ValueError:
+                for mf in self.sp.sp__value_components:
+                    fc_data = getattr(rid.feature_sets[feature_key], mf, [])
+                    if not len(fc_data):
                         continue
+                    v = min(fc_data)
                     if v < self.reconstituted_info.dfill:
                         self.reconstituted_info.dfill = v
             else:
@@ -214,9 +212,7 @@ class SPHandling:
                 used_keys[fc].append(fs)
                 if len(x) < lfrq:
                     fadd.append(lfrq - len(x))
-                    yend = y[-1]
-                    for i in range(len(x), lfrq):
-                        y.append(yend)
+                    y = np.concatenate([y, np.full(lfrq - len(x), y[-1])])
                 elif len(x) > lfrq:
                     ftrunc.append(len(x) - lfrq)
                     y = y[:lfrq]
@@ -10,6 +10,8 @@ from __future__ import print_function, absolute_import, division
 import os
 import copy
 import six
+from argparse import Namespace
+from concurrent import futures
 import numpy as np
 import matplotlib.pyplot as plt
 from .. import rids
@@ -18,13 +20,14 @@ from . import peak_det  # Another option that seems to do better.
 from . import bw_finder
 
 
-class Spectral:
+class Spectral(object):
     """
     Generic spectral class, with the 'basics' initialized.  The other fields may get added
-    as appropriate.
+    as appropriate (unset fields raise AttributeError, as without __slots__).
     For now, the order matters for 'spectral_fields' since used to order peak-finding priority
     """
-    spectral_fields = ['maxhold', 'minhold', 'val', 'comment', 'polarization', 'freq', 'bw']
+    spectral_fields = ('maxhold', 'minhold', 'val', 'comment', 'polarization', 'freq', 'bw')
+    __slots__ = spectral_fields
 
     def __init__(self, polarization='', comment=''):
         self.comment = comment
@@ -112,10 +115,13 @@ class SpectrumPeak(rids.Rids):
         rbw:  if spectrum analyzer, resolution bandwidth (probably channel_width)
         rbw_unit:
     """
-    sp__direct_attributes = ['peaked_on', 'delta', 'bw_range', 'feature_module_name',
-                             'freq', 'freq_unit', 'fmin', 'fmax', 'val_unit']
-    sp__unit_attributes = ['threshold', 'rbw', 'vbw']
-    sp__polarizations = ['E', 'N', 'I', 'Q', 'U', 'V', 'H', 'X', 'Y', 'unk', 'none']
+    sp__direct_attributes = ('peaked_on', 'delta', 'bw_range', 'feature_module_name',
+                             'freq', 'freq_unit', 'fmin', 'fmax', 'val_unit')
+    sp__unit_attributes = ('threshold', 'rbw', 'vbw')
+    sp__polarizations = ('E', 'N', 'I', 'Q', 'U', 'V', 'H', 'X', 'Y', 'unk', 'none')
+    # dtypes of the feature_components written as binary arrays in columnar files
+    sp__column_dtypes = {'freq': '<f8', 'bw': '<f8', 'maxhold': '<f4', 'minhold': '<f4', 'val': '<f4'}
+    sp__value_components = ('maxhold', 'minhold', 'val')
 
     def __init__(self, comment='', share_freq=False, view_ongoing=False):
         # Initialize base attributes
@@ -141,23 +147,26 @@ class SpectrumPeak(rids.Rids):
         self.view_ongoing_features = view_ongoing
         self.share_freq = share_freq
         self.cal_files_present = False
-        self.all_lowercase_polarization_names = [x.lower() for x in self.sp__polarizations]
+        self.all_lowercase_polarization_names = frozenset(x.lower() for x in self.sp__polarizations)
 
     # Redefine the reader/writer/info base modules
-    def reader(self, filename, reset=True):
+    def reader(self, filename, reset=True, as_arrays=False):
         print("Reading {}".format(filename))
         if reset:
             self.reset()
         self._reader(filename, feature_direct=self.sp__direct_attributes,
-                     feature_unit=self.sp__unit_attributes)
+                     feature_unit=self.sp__unit_attributes, as_arrays=as_arrays)
         # now need to fill in the share_freq feature values, if any
         for ftr in self.feature_sets:
-            if self.feature_sets[ftr].freq == '@':
+            if isinstance(self.feature_sets[ftr].freq, six.string_types):  # '@'
                 self.feature_sets[ftr].freq = self.freq
 
-    def writer(self, filename, fix_list=True):
+    def writer(self, filename, fix_list=True, pretty=False, columnar=False, quantize=None, compact=False,
+               compresslevel=None):
         self._writer(filename, feature_direct=self.sp__direct_attributes,
-                     feature_unit=self.sp__unit_attributes, fix_list=fix_list)
+                     feature_unit=self.sp__unit_attributes, feature_columns=self.sp__column_dtypes,
+                     quantized_columns=self.sp__value_components, fix_list=fix_list, pretty=pretty,
+                     columnar=columnar, quantize=quantize, compact=compact, compresslevel=compresslevel)
 
     def info(self):
         self._info(feature_direct=self.sp__direct_attributes,
@@ -171,8 +180,9 @@ class SpectrumPeak(rids.Rids):
         This is used in RIDS parent class for base reader.
         """
         feature_set = Spectral()
+        fcs = self.feature_components
         for v, Y in six.iteritems(fs):
-            if v not in self.feature_components:
+            if v not in fcs:
                 print("Unexpected field {}".format(v))
                 continue
             setattr(feature_set, v, Y)
@@ -184,13 +194,60 @@ class SpectrumPeak(rids.Rids):
         with naming convention as realized in module '_peel_filename' below
         **fnargs are filenames for self.feature_components {"feature_component": <filename>}
         """
+        self.get_feature_sets_from_files([(fset_tag, polarization, peak_on, fnargs)], max_workers=1)
+
+    def get_feature_sets_from_files(self, fset_args, max_workers=None):
+        """
+        As get_feature_set_from_files, for a list of (fset_tag, polarization, peak_on, fnargs).
+        The files are read and peaks found in up to max_workers threads (None uses the
+        ThreadPoolExecutor default), and the feature_sets are then added in order.
+        """
+        peak_fc = [self._get_peak_component(fset_tag, peak_on, fnargs)
+                   for fset_tag, polarization, peak_on, fnargs in fset_args]
+
+        def _read(i):
+            fset_tag, polarization, peak_on, fnargs = fset_args[i]
+            return self._read_feature_set(fset_tag, polarization, peak_fc[i], fnargs)
+
+        if max_workers == 1 or self.view_ongoing_features:
+            for i in range(len(fset_args)):
+                self._add_feature_set(_read(i))
+        else:
+            with futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for fsr in executor.map(_read, range(len(fset_args))):
+                    self._add_feature_set(fsr)
+
+    def _get_peak_component(self, fset_tag, peak_on, fnargs):
+        """
+        Get the feature_component to use to find peaks (None if no peaks) and set peaked_on
+        """
+        if is_spectrum(fset_tag):
+            return None
+        if peak_on is not None:
+            fc = peak_on
+        else:
+            for fc in self.feature_components:
+                if fc in fnargs.keys() and fnargs[fc] is not None:
+                    break
+            else:
+                return None
+        if self.peaked_on is None:
+            self.peaked_on = fc
+        return fc
+
+    def _read_feature_set(self, fset_tag, polarization, peak_fc, fnargs):
+        """
+        Reads the spectrum files and finds the peaks/bw on peak_fc.  This doesn't change self, so
+        may be run in threads.  Returns a Namespace used by _add_feature_set.
+        """
         fset_name = fset_tag + polarization
-        self.feature_sets[fset_name] = Spectral(polarization=polarization)
-        self.feature_sets[fset_name].freq = []
+        fsr = Namespace(fset_name=fset_name, fmin=None, fmax=None, freq=None, hipk=None)
+        fsr.feature_set = Spectral(polarization=polarization)
+        fsr.feature_set.freq = []
         if len(fnargs) > 1:
             check_timestamps_for_match = _check_timestamps_for_match(**fnargs)
             if len(check_timestamps_for_match):
-                self.feature_sets[fset_name].comment += check_timestamps_for_match
+                fsr.feature_set.comment += check_timestamps_for_match
         if self.show_progress:
             print("Processing {}".format(fset_name))
         spectra = {}
@@ -203,86 +260,110 @@ class SpectrumPeak(rids.Rids):
             _spectrum_reader(sfn, spectra[fc], polarization)
             ftr_fmin = min(spectra[fc].freq)
             ftr_fmax = max(spectra[fc].freq)
-            if ftr_fmin < self.fmin:
-                self.fmin = ftr_fmin
-            if ftr_fmax > self.fmax:
-                self.fmax = ftr_fmax
+            if fsr.fmin is None or ftr_fmin < fsr.fmin:
+                fsr.fmin = ftr_fmin
+            if fsr.fmax is None or ftr_fmax > fsr.fmax:
+                fsr.fmax = ftr_fmax
             if is_spectrum(fset_tag):
                 if self.share_freq:
-                    self.feature_sets[fset_name].freq = '@'
-                    if self.freq is None:
-                        self.freq = copy.copy(spectra[fc].freq)
-                elif len(spectra[fc].freq) > len(self.feature_sets[fset_name].freq):
-                    self.feature_sets[fset_name].freq = spectra[fc].freq
-                setattr(self.feature_sets[fset_name], fc, spectra[fc].val)
+                    fsr.feature_set.freq = '@'
+                    if fsr.freq is None:
+                        fsr.freq = copy.copy(spectra[fc].freq)
+                elif len(spectra[fc].freq) > len(fsr.feature_set.freq):
+                    fsr.feature_set.freq = spectra[fc].freq
+                setattr(fsr.feature_set, fc, spectra[fc].val)
             if len(spectra[fc].comment):
-                self.feature_sets[fset_name].comment += spectra[fc].comment
-        self.nsets += 1
-        if is_spectrum(fset_tag):
-            return
+                fsr.feature_set.comment += spectra[fc].comment
+        if peak_fc is None:
+            return fsr
 
-        # Get the feature_component to use and find peaks/bw
-        if peak_on is not None:
-            fc = peak_on
-        else:
-            for fc in self.feature_components:
-                if fc in fnargs.keys() and fnargs[fc] is not None:
-                    break
-            else:
-                return
-        if self.peaked_on is None:
-            self.peaked_on = fc
-        elif fc != self.peaked_on:
+        fc = peak_fc
+        if fc != self.peaked_on:
             spectra[fc].comment += 'Peaked on different component: {} rather than {}'.format(fc, self.peaked_on)
-        # self.peak_finder(spectra[fc])  # old version not used anymore
-        self.peak_det(spectra[fc], delta=self.delta)
-        self.find_bw()
+        # old version (peak_finder) not used anymore
+        hipk_freq, hipk_val, hipk = self._peak_det(spectra[fc], delta=self.delta)
+        hipk_bw = self._find_bw(hipk_freq, hipk_val, hipk)
+        fsr.hipk = (hipk_freq, hipk_val, hipk, hipk_bw)
 
         # put values in feature set dictionary
-        self.feature_sets[fset_name].freq = list(np.array(self.hipk_freq)[self.hipk])
+        fsr.feature_set.freq = hipk_freq[hipk].tolist()
         if len(spectra[fc].comment):
-            self.feature_sets[fset_name].comment += spectra[fc].comment
+            fsr.feature_set.comment += spectra[fc].comment
+        last_pk = hipk.max() if len(hipk) else -1
         for fc, sfn in six.iteritems(fnargs):
-            if sfn is None:
+            if sfn is None or fc not in spectra:
                 continue
-            try:
-                setattr(self.feature_sets[fset_name], fc, list(np.array(spectra[fc].val)[self.hipk]))
-            except IndexError:
-                pass
-        self.feature_sets[fset_name].bw = self.hipk_bw
+            val = np.asarray(spectra[fc].val)
+            if last_pk < len(val):
+                setattr(fsr.feature_set, fc, val[hipk].tolist())
+        fsr.feature_set.bw = hipk_bw
+        return fsr
+
+    def _add_feature_set(self, fsr):
+        """
+        Adds the feature_set read by _read_feature_set.
+        """
+        self.feature_sets[fsr.fset_name] = fsr.feature_set
+        if fsr.fmin is not None and fsr.fmin < self.fmin:
+            self.fmin = fsr.fmin
+        if fsr.fmax is not None and fsr.fmax > self.fmax:
+            self.fmax = fsr.fmax
+        if fsr.freq is not None and self.freq is None:
+            self.freq = fsr.freq
+        self.nsets += 1
+        if fsr.hipk is not None:
+            self.hipk_freq, self.hipk_val, self.hipk, self.hipk_bw = fsr.hipk
+            if self.view_ongoing_features:
+                self.peak_viewer()
 
     def peak_det(self, spec, delta=0.1):
-        self.hipk_freq = spec.freq
-        self.hipk_val = spec.val
-        self.hipk = peak_det.peakdet(spec.val, delta=delta, threshold=self.threshold)
-        self.hipk = list(self.hipk)
+        self.hipk_freq, self.hipk_val, self.hipk = self._peak_det(spec, delta=delta)
+        return self.hipk_freq, self.hipk_val, self.hipk
+
+    def _peak_det(self, spec, delta=0.1):
+        """
+        Returns the freq and val arrays of spec and the indices of its peaks (doesn't change self).
+        """
+        hipk_freq = np.asarray(spec.freq)
+        hipk_val = np.asarray(spec.val)
+        hipk = np.asarray(peak_det.peakdet(hipk_val, delta=delta, threshold=self.threshold), dtype=int)
+        return hipk_freq, hipk_val, hipk
 
     def find_bw(self):
-        self.hipk_bw = bw_finder.bw_finder(self.hipk_freq, self.hipk_val, self.hipk, self.bw_range)
+        self.hipk_bw = self._find_bw(self.hipk_freq, self.hipk_val, self.hipk)
         if self.view_ongoing_features:
             self.peak_viewer()
+        return self.hipk_bw
+
+    def _find_bw(self, hipk_freq, hipk_val, hipk):
+        """
+        Returns the bandwidths of the peaks hipk (doesn't change self).
+        """
+        return bw_finder.bw_finder(hipk_freq, hipk_val, hipk, self.bw_range)
 
     def peak_finder(self, spec, cwt_range=[1, 3], rc_range=[4, 4]):
         """
         Deprecated peak_finder
         """
-        self.hipk_freq = spec.freq
-        self.hipk_val = spec.val
-        self.hipk = peaks.fp(spec.val, self.threshold, cwt_range, rc_range)
+        self.hipk_freq = np.asarray(spec.freq)
+        self.hipk_val = np.asarray(spec.val)
+        self.hipk = np.asarray(peaks.fp(self.hipk_val, self.threshold, cwt_range, rc_range), dtype=int)
 
     def peak_viewer(self):
         if self.hipk is None:
             return
         plt.plot(self.hipk_freq, self.hipk_val)
-        plt.plot(np.array(self.hipk_freq)[self.hipk], np.array(self.hipk_val)[self.hipk], 'kv')
+        fv = self.hipk_freq[self.hipk]
+        vv = self.hipk_val[self.hipk]
+        plt.plot(fv, vv, 'kv')
         if self.hipk_bw is not None:
-            vv = np.array(self.hipk_val)[self.hipk]
             if 'dB' in self.val_unit:
                 vv2 = vv - 6.0
             else:
                 vv2 = vv / 4.0
-            fl = np.array(self.hipk_freq)[self.hipk] + np.array(self.hipk_bw)[:, 0]
-            fr = np.array(self.hipk_freq)[self.hipk] + np.array(self.hipk_bw)[:, 1]
+            bw = np.asarray(self.hipk_bw)
+            fl = fv + bw[:, 0]
+            fr = fv + bw[:, 1]
             plt.plot([fl, fl], [vv, vv2], 'm')
             plt.plot([fr, fr], [vv, vv2], 'c')
         plt.show()
@@ -303,8 +384,8 @@ class SpectrumPeak(rids.Rids):
             print("Threshold view not implemented yet.")
             threshold = None
         fc_list = collections.OrderedDict([('maxhold', ('r', 'v')), ('minhold', ('b', '^')), ('val', ('k', '_'))])
-        if isinstance(show_components, (str, unicode)):
-            show_components = fc_list.keys()
+        if isinstance(show_components, six.string_types):
+            show_components = list(fc_list.keys())
         color_list = ['r', 'b', 'k', 'g', 'm', 'c', 'y', '0.25', '0.5', '0.75']
         line_list = ['-', '--', ':']
         c = 0
@@ -317,45 +398,44 @@ class SpectrumPeak(rids.Rids):
             if issp:
                 clr = [fc_list[x][0] for x in show_components]
                 ls = [line_list[bl % len(line_list)]] * len(show_components)
-                fmt = zip(clr, ls)
+                fmt = list(zip(clr, ls))
                 bl += 1
-                if use_freq == '@':
+                if isinstance(use_freq, six.string_types):  # '@' for share_freq
                     use_freq = self.freq
             else:
                 clr = [color_list[c % len(color_list)]] * len(show_components)
                 mkr = [fc_list[x][1] for x in fc_list]
-                fmt = zip(clr, mkr)
+                fmt = list(zip(clr, mkr))
                 c += 1
-            for fc in show_components:
-                try:
-                    i = show_components.index(fc)
-                    _spectrum_plotter(use_freq, getattr(v, fc), fmt=fmt[i], is_spectrum=issp, figure_name=self.rid_file)
-                except AttributeError:
-                    pass
+            # arrays so that _spectrum_plotter slices views rather than copies
+            use_freq = np.asarray(use_freq)
+            for i, fc in enumerate(show_components):
+                if hasattr(v, fc):
+                    _spectrum_plotter(use_freq, np.asarray(getattr(v, fc)), fmt=fmt[i], is_spectrum=issp,
+                                      figure_name=self.rid_file)
             if issp:
                 continue
             # Now plot bandwidth
-            try:
-                vv = np.array(getattr(v, self.peaked_on))
-                fv = np.array(use_freq)
-                bw = np.array(v.bw)
-                if 'dB' in self.val_unit:
-                    vv2 = vv - 6.0
-                else:
-                    vv2 = vv / 4.0
-                fl = fv + bw[:, 0]
-                if self.fmin is not None:
-                    ifl = np.where(fl < self.fmin)
-                    fl[ifl] = self.fmin
-                fr = fv + bw[:, 1]
-                if self.fmax is not None:
-                    ifr = np.where(fr > self.fmax)
-                    fr[ifr] = self.fmax
-                for j in range(len(fl)):
-                    plt.plot([fl[j], fl[j]], [vv[j], vv2[j]], clr[0])
-                    plt.plot([fr[j], fr[j]], [vv[j], vv2[j]], clr[0])
-            except AttributeError:
+            if self.peaked_on is None or not hasattr(v, self.peaked_on) or not hasattr(v, 'bw'):
                 continue
+            vv = np.asarray(getattr(v, self.peaked_on))
+            fv = use_freq
+            bw = np.asarray(v.bw)
+            if 'dB' in self.val_unit:
+                vv2 = vv - 6.0
+            else:
+                vv2 = vv / 4.0
+            fl = fv + bw[:, 0]
+            if self.fmin is not None:
+                ifl = np.where(fl < self.fmin)
+                fl[ifl] = self.fmin
+            fr = fv + bw[:, 1]
+            if self.fmax is not None:
+                ifr = np.where(fr > self.fmax)
+                fr[ifr] = self.fmax
+            for j in range(len(fl)):
+                plt.plot([fl[j], fl[j]], [vv[j], vv2[j]], clr[0])
+                plt.plot([fr[j], fr[j]], [vv[j], vv2[j]], clr[0])
         plt.show()
 
     def read_cal(self, filename, polarization):
@@ -367,7 +447,8 @@ class SpectrumPeak(rids.Rids):
         print("NOT IMPLEMENTED YET: Apply the calibration, if available.")
 
     def process_files(self, directory='.', ident='all', data=[0, -1], peak_on=None,
-                      data_only=False, sets_per_pol=10000, keep_data=False, show_progress=False):
+                      data_only=False, sets_per_pol=10000, keep_data=False, show_progress=False,
+                      columnar=False, quantize=None, compact=False, max_workers=None, file_type='ridz'):
         """
         This is the standard method to process spectrum files in a directory to
         produce ridz files.  The module has an "outer loop" that is meant to handle
@@ -386,7 +467,17 @@ class SpectrumPeak(rids.Rids):
         data_only:  flag if only saving data and not peaks
         sets_per_pol:  number of feature_sets per pol per ridz file (i.e. number of timestamps/pol/file)
         keep_data:  if False (default) it will delete the processed files, otherwise it will keep
+        columnar:  if True, write the spectra as binary arrays rather than json lists
+        quantize:  None, 'float16' or 'int16' to reduce the precision of written spectra values
+        compact:  if True, use single letter feature_component names in the written file
+        max_workers:  number of threads used to read files and find peaks (default 2 per polarization)
+        file_type:  extension of the written files, 'ridz' (gzip), 'ridz2' (zstandard) or 'rids'
         """
+        rids.check_quantize(quantize)
+        if file_type not in ('ridz', 'ridz2', 'rids'):
+            raise ValueError("Unknown file_type {}".format(file_type))
+        if file_type == 'ridz2' and rids.zstd is None:
+            raise ImportError("zstandard is needed to write .ridz2 files")
         self.show_progress = show_progress
         # Get overall meta-data for filename
         th_for_fn = ''
@@ -403,7 +494,9 @@ class SpectrumPeak(rids.Rids):
 
         # Get file_idp FileSet of files to do
         file_idp = {}  # keyed set of classes for file-sets
-        for af in sorted(os.listdir(directory)):
+        with os.scandir(directory) as entries:
+            filenames = sorted(entry.name for entry in entries if entry.is_file())
+        for af in filenames:
             if 'rid' in af.split('.')[-1] or af[0] == '.':
                 continue
             fnd = _peel_filename(af, self.feature_components)
@@ -430,47 +523,41 @@ class SpectrumPeak(rids.Rids):
                 if pol not in getattr(file_idp[idkey], feco):
                     getattr(file_idp[idkey], feco)[pol] = {}
                 getattr(file_idp[idkey], feco)[pol][fnd['timestamp']] = af
-        # Now process that dictionary
-        for idkey in file_idp:
-            #  This is the start of one id
-            file_idp[idkey].chunk_it(sets_per_pol)
-            bp = file_idp[idkey].biggest_pol
-
-            for i in range(bp['len']):
-                # This is start of one file
-                self.fmin = 1E9
-                self.fmax = -1E9
-                self.timestamp_first, self.timestamp_last = file_idp[idkey].chunked_time_limits[i][0], file_idp[idkey].chunked_time_limits[i][-1]
-                if self.cal_files_present:
-                    print("NOT IMPLEMENTED.  Need to rewrite the cal files.")
-                self.feature_sets = {}  # Reset the features sets for new file.
-                self.nsets = 0
-                files_this_pass = set()
-                for pol in file_idp[idkey].chunked:
-                    try:
-                        chunk_ts_list = file_idp[idkey].chunked[pol][i]
-                    except IndexError:
-                        chunk_ts_list = []
-                    # This is the start of one feature_set
-                    # ... get data spectrum files
-                    for j in data:
+        # Now process that dictionary (processed files are deleted in the background)
+        remover = futures.ThreadPoolExecutor(max_workers=1)
+        removals = []
+        try:
+            for idkey in file_idp:
+                #  This is the start of one id
+                file_idp[idkey].chunk_it(sets_per_pol)
+                bp = file_idp[idkey].biggest_pol
+                workers = max_workers
+                if workers is None:
+                    workers = 2 * len(file_idp[idkey].chunked)
+
+                for i in range(bp['len']):
+                    # This is start of one file
+                    self.fmin = 1E9
+                    self.fmax = -1E9
+                    self.timestamp_first, self.timestamp_last = file_idp[idkey].chunked_time_limits[i][0], file_idp[idkey].chunked_time_limits[i][-1]
+                    if self.cal_files_present:
+                        print("NOT IMPLEMENTED.  Need to rewrite the cal files.")
+                    self.feature_sets = {}  # Reset the features sets for new file.
+                    self.nsets = 0
+                    files_this_pass = set()
+                    fset_args = []
+                    for pol in file_idp[idkey].chunked:
                         try:
-                            ts = chunk_ts_list[j]
+                            chunk_ts_list = file_idp[idkey].chunked[pol][i]
                         except IndexError:
-                            break
-                        fnargs = {}
-                        for feco in file_idp[idkey].included_feature_components:
+                            chunk_ts_list = []
+                        # This is the start of one feature_set
+                        # ... get data spectrum files
+                        for j in data:
                             try:
-                                fnargs[feco] = os.path.join(directory, getattr(file_idp[idkey], feco)[pol][ts])
-                                files_this_pass.add(fnargs[feco])
-                            except KeyError:
-                                continue
-                        if len(fnargs):
-                            feature_tag = 'data:{}:'.format(ts)
-                            self.get_feature_set_from_files(feature_tag, pol, **fnargs)
-                    if not data_only:
-                        # ... get feature_sets
-                        for ts in chunk_ts_list:
+                                ts = chunk_ts_list[j]
+                            except IndexError:
+                                break
                             fnargs = {}
                             for feco in file_idp[idkey].included_feature_components:
                                 try:
@@ -479,17 +566,39 @@ class SpectrumPeak(rids.Rids):
                                 except KeyError:
                                     continue
                             if len(fnargs):
-                                feature_tag = '{}:'.format(ts)
-                                self.get_feature_set_from_files(feature_tag, pol, peak_on=peak_on, **fnargs)
-                if not keep_data:
-                    # ... delete processed files
-                    for x in files_this_pass:
-                        os.remove(x)
-                # Write the ridz file
-                fn = "{}_{}.{}.n{}.{}{}.ridz".format(idkey, self.feature_module_name, self.timestamp_first,
-                                                     self.nsets, pk_for_fn, th_for_fn)
-                filename = os.path.join(directory, fn)
-                self.writer(filename)
+                                feature_tag = 'data:{}:'.format(ts)
+                                fset_args.append((feature_tag, pol, None, fnargs))
+                        if not data_only:
+                            # ... get feature_sets
+                            for ts in chunk_ts_list:
+                                fnargs = {}
+                                for feco in file_idp[idkey].included_feature_components:
+                                    try:
+                                        fnargs[feco] = os.path.join(directory, getattr(file_idp[idkey], feco)[pol][ts])
+                                        files_this_pass.add(fnargs[feco])
+                                    except KeyError:
+                                        continue
+                                if len(fnargs):
+                                    feature_tag = '{}:'.format(ts)
+                                    fset_args.append((feature_tag, pol, peak_on, fnargs))
+                    self.get_feature_sets_from_files(fset_args, max_workers=workers)
+                    # Write the ridz file
+                    fn = "{}_{}.{}.n{}.{}{}.{}".format(idkey, self.feature_module_name, self.timestamp_first,
+                                                       self.nsets, pk_for_fn, th_for_fn, file_type)
+                    filename = os.path.join(directory, fn)
+                    self.writer(filename, columnar=columnar, quantize=quantize, compact=compact)
+                    if not keep_data:
+                        # ... delete processed files (once written)
+                        removals.append(remover.submit(_remove_files, files_this_pass))
+        finally:
+            remover.shutdown(wait=True)
+        for removal in removals:
+            removal.result()  # raises any error from removing the files
+
+
+def _remove_files(filenames):
+    for x in filenames:
+        os.remove(x)
 
 
 def _spectrum_reader(filename, spec, polarization=None):
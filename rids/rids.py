@@ -8,17 +8,35 @@ This module defines the base format.
 
 from __future__ import print_function, absolute_import, division
 import json
+import keyword
 import os
+import re
 import six
+import string
 import gzip
+import zlib
+import mmap
+import struct
 import copy
 import numpy as np
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import zstandard as zstd
+except ImportError:
+    zstd = None
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
 
 class Rids(object):
     """
     RF Interference Data System (RIDS)
-    Reads/writes .ridm/.ridz files, JSON files with fields as described below.  This is the building
+    Reads/writes .ridm/.ridz/.ridz2 files, JSON files with fields as described below.  This is the building
     block and should read any rids file.  If feature_module is None it ignores features.
     Timestamps should be sortable to increasing time (can fix this later if desired...).
 
@@ -45,9 +63,11 @@ class Rids(object):
             feature_sets:  features etc defined in the feature module
     """
     # Along with the feature attributes, these are the allowed attributes for json r/w
-    direct_attributes = ['rid_file', 'ident', 'instrument', 'receiver', 'comment',
-                         'timestamp_first', 'timestamp_last', 'time_format', 'nsets']
-    unit_attributes = ['channel_width', 'time_constant']
+    direct_attributes = ('rid_file', 'ident', 'instrument', 'receiver', 'comment',
+                         'timestamp_first', 'timestamp_last', 'time_format', 'nsets')
+    unit_attributes = ('channel_width', 'time_constant')
+    # Files larger than this (bytes on disk) are parsed incrementally if ijson is available
+    stream_size = 16 * 1024 * 1024
 
     def __init__(self, comment=None, **diagnose):
         for d in self.direct_attributes:
@@ -69,7 +89,7 @@ class Rids(object):
     def get_datetime_from_timestamp(self, ts):
         if self.time_format.lower() == 'julian':
             from astropy.time import Time
-            if isinstance(ts, (str, unicode)):
+            if isinstance(ts, six.string_types):
                 ts = float(ts)
             dt = Time(ts, format='jd', scale='utc')
             return dt.datetime
@@ -82,22 +102,41 @@ class Rids(object):
         return None
 
     def set(self, **kwargs):
-        for k in kwargs:
+        for k, x in six.iteritems(kwargs):
             if k in self.direct_attributes:
-                setattr(self, k, kwargs[k])
+                setattr(self, k, x)
             elif k in self.unit_attributes:
-                self.set_unit_values(self, k, kwargs[k])
+                set_unit_values(self, k, x)
+
+    @property
+    def comment(self):
+        # Appended comments are kept as a list and only joined here
+        if not self._comment:
+            return None
+        return '\n'.join(self._comment)
+
+    @comment.setter
+    def comment(self, comment):
+        self._comment = [] if comment is None else [comment]
 
     def append_comment(self, comment):
+        """
+        Appends comment on a new line, with the whole comment stripped of outer whitespace.
+        """
         if comment is None:
             return
-        if self.comment is None:
-            self.comment = comment
+        if not self._comment:
+            self._comment = [comment.strip()]
+            return
+        self._comment[0] = self._comment[0].lstrip()
+        if not self._comment[0]:
+            self._comment = [comment.strip()]
+        elif comment.strip():
+            self._comment.append(comment.rstrip())
         else:
-            self.comment += ('\n' + comment)
-        self.comment = self.comment.strip()
+            self._comment[-1] = self._comment[-1].rstrip()
 
-    def reader(self, filename, reset=True):
+    def reader(self, filename, reset=True, as_arrays=False):
         """
         This will read a RID file with a full or subset of structure entities.
 
@@ -107,22 +146,44 @@ class Rids(object):
         reset:  If true, resets all elements.
                 If false, will overwrite headers etc but add events
                     (i.e. things with a unique key won't get overwritten)
+        as_arrays:  If true, the columns of a columnar file are read as read-only ndarrays
+                    (views of the memory-mapped file if uncompressed) rather than lists.
+                    writer replaces rather than overwrites files, so the views stay valid if
+                    written back to the same file, but not if it is changed some other way.
         """
         if reset:
             self.reset()
-        self._reader(filename, reset=reset)
+        self._reader(filename, as_arrays=as_arrays)
 
-    def _reader(self, filename, feature_direct=[], feature_unit=[]):
+    def _reader(self, filename, feature_direct=(), feature_unit=(), as_arrays=False):
         self.rid_file = filename
-        file_type = filename.split('.')[-1].lower()
-        if file_type == 'ridz':
-            r_open = gzip.open
+        if ijson is not None and os.path.getsize(filename) > self.stream_size and not is_columnar(filename):
+            comment = list(self._comment)
+            try:
+                with rid_open(filename, 'rb') as f:
+                    self._read_items(stream_items(f), feature_direct, feature_unit)
+                return
+            except ijson.JSONError:
+                # ijson rejects NaN/Infinity, so read it in one go below (everything else
+                # read so far is just set again, but the comment would be appended twice)
+                self._comment = comment
+        if not is_compressed(filename) and is_columnar(filename):
+            data, blob = map_payload(filename)
         else:
-            r_open = open
-        with r_open(filename, 'rb') as f:
-            data = json.load(f)
-        for d, val in six.iteritems(data):
-            if d == 'comment':
+            with rid_open(filename, 'rb') as f:
+                data, blob = unpack_payload(f.read())
+        self._read_items(six.iteritems(data), feature_direct, feature_unit,
+                         long_keys=data.get('_k'), blob=blob, as_arrays=as_arrays)
+
+    def _read_items(self, items, feature_direct, feature_unit, long_keys=None, blob=None, as_arrays=False):
+        """
+        Sets the attributes/feature_sets from the (key, value) json items.
+        Columns in blob are read as lists, or as ndarrays if as_arrays (see read_columns).
+        """
+        for d, val in items:
+            if d == '_k':
+                long_keys = val
+            elif d == 'comment':
                 self.append_comment(val)
             elif d in self.direct_attributes:
                 setattr(self, d, val)
@@ -136,55 +197,72 @@ class Rids(object):
                 if self.feature_sets is None:
                     continue
                 for k, fs in six.iteritems(val):
+                    if long_keys is not None:
+                        fs = {long_keys.get(v, v): Y for v, Y in six.iteritems(fs)}
+                    if blob is not None:
+                        fs = read_columns(fs, blob, as_arrays=as_arrays)
                     self.feature_sets[k] = self.read_feature_set_dict(fs)
 
-    def writer(self, filename, fix_list=True):
-        self._writer(filename, fix_list=fix_list)
+    def writer(self, filename, fix_list=True, pretty=False, compresslevel=None):
+        self._writer(filename, fix_list=fix_list, pretty=pretty, compresslevel=compresslevel)
 
-    def _writer(self, filename, feature_direct=[], feature_unit=[], fix_list=True):
+    def _writer(self, filename, feature_direct=(), feature_unit=(), feature_columns=None,
+                quantized_columns=(), fix_list=True, pretty=False, columnar=False, quantize=None,
+                compact=False, compresslevel=None):
         """
         This writes a RID file with a full structure.  If a field is None it ignores.
+        The json is compact unless pretty (indented, with lists on one line if fix_list).
+        If columnar, the feature_set components in feature_columns ({component: dtype}) are
+        written as binary arrays after the json header (see pack_payload) rather than as json lists.
+        quantize ('float16' or 'int16') reduces the quantized_columns further (implies columnar).
+        If compact, the feature_set component names are replaced by single letters, with the
+        lookup table written as '_k'.
+        compresslevel is the gzip/zstandard level for .ridz/.ridz2 files (see rid_open).
         """
-        ds = {}
-        for d in self.direct_attributes:
-            val = getattr(self, d)
-            if val is not None:
-                ds[d] = val
-        for d in feature_direct:
-            val = getattr(self, d)
-            if val is not None:
-                ds[d] = val
-        for d in self.unit_attributes:
-            val = getattr(self, d)
-            if val is not None:
-                ds[d] = "{} {}".format(val, getattr(self, d + '_unit'))
-        for d in feature_unit:
-            val = getattr(self, d)
-            if val is not None:
-                ds[d] = "{} {}".format(val, getattr(self, d + '_unit'))
+        check_quantize(quantize)
+        if quantize is not None:
+            columnar = True
+        if feature_columns is None:
+            feature_columns = {}
+        to_dict = header_to_dict(self.direct_attributes + tuple(feature_direct),
+                                 self.unit_attributes + tuple(feature_unit))
+        ds = to_dict(self)
         ds['feature_sets'] = {}
-        for d in self.feature_sets:
-            ds['feature_sets'][d] = {}
-            for v in self.feature_components:
-                try:
-                    ds['feature_sets'][d][v] = getattr(self.feature_sets[d], v)
-                except AttributeError:
-                    continue
-        jsd = json.dumps(ds, sort_keys=True, indent=4, separators=(',', ':'))
-        if fix_list:
-            jsd = fix_json_list(jsd)
-        file_type = filename.split('.')[-1].lower()
-        if file_type == 'ridz':
-            r_open = gzip.open
-        else:
-            r_open = open
-        with r_open(filename, 'wb') as f:
-            f.write(jsd.encode('utf-8'))
+        blob = bytearray() if columnar else None
+        fcs = self.feature_components
+        if compact:
+            short_keys = dict(zip(fcs, string.ascii_lowercase))
+            ds['_k'] = {sk: v for v, sk in six.iteritems(short_keys)}
+        for d, fs in six.iteritems(self.feature_sets):
+            fsd = {v: getattr(fs, v) for v in fcs if getattr(fs, v, None) is not None}
+            if columnar:
+                for v, val in six.iteritems(fsd):
+                    if v in feature_columns and not isinstance(val, six.string_types):
+                        q = quantize if v in quantized_columns else None
+                        fsd[v] = write_column(val, feature_columns[v], blob, quantize=q)
+            if compact:
+                fsd = {short_keys[v]: val for v, val in six.iteritems(fsd)}
+            ds['feature_sets'][d] = fsd
+        jsd = json_dumps(ds, pretty=pretty)
+        if pretty and fix_list:
+            jsd = fix_json_list(jsd.decode('utf-8')).encode('utf-8')
+        # Written to a temporary file that then replaces filename, so that arrays still mapped
+        # from filename (see reader as_arrays) don't change underneath
+        tmpname = os.path.join(os.path.dirname(filename), '.{}.{}.tmp.{}'.format(
+            os.path.basename(filename), os.getpid(), filename.split('.')[-1]))
+        try:
+            with rid_open(tmpname, 'wb', compresslevel=compresslevel) as f:
+                f.write(pack_payload(jsd, blob))
+            os.replace(tmpname, filename)
+        except BaseException:
+            if os.path.exists(tmpname):
+                os.remove(tmpname)
+            raise
 
     def info(self):
         self._info()
 
-    def _info(self, feature_direct=[], feature_unit=[], dirlen=50):
+    def _info(self, feature_direct=(), feature_unit=(), dirlen=50):
         print("RIDS Information")
         for d in self.direct_attributes:
             val = getattr(self, d)
@@ -204,17 +282,286 @@ class Rids(object):
             print("Note that the stated nsets={} does not match the found nsets={}".format(self.nsets, len(self.feature_sets)))
 
 
+# Default compression levels for writing:  gzip 1 is much faster than its default 9 for only
+# slightly larger files
+default_compresslevel = {'ridz': 1, 'ridz2': 3}
+
+
+def rid_open(filename, mode='rb', compresslevel=None):
+    """
+    Opens a rids file for binary read/write based on its extension:
+        .ridz:  gzip
+        .ridz2:  zstandard (multi-threaded compression)
+        other:  uncompressed
+    compresslevel is used when writing (None uses default_compresslevel).
+    """
+    file_type = filename.split('.')[-1].lower()
+    if compresslevel is None:
+        compresslevel = default_compresslevel.get(file_type)
+    if file_type == 'ridz':
+        if 'r' in mode:
+            return gzip.open(filename, mode)
+        zlib.compressobj(compresslevel)  # checks the level before the file is opened
+        return gzip.GzipFile(filename, mode, compresslevel=compresslevel)
+    if file_type == 'ridz2':
+        if zstd is None:
+            raise ImportError("zstandard is needed to read/write .ridz2 files")
+        if 'r' in mode:
+            return zstd.ZstdDecompressor().stream_reader(open(filename, mode))
+        cctx = zstd.ZstdCompressor(level=compresslevel, threads=-1)
+        return cctx.stream_writer(open(filename, mode))
+    return open(filename, mode)
+
+
+# Columnar payloads are:  magic, uint32 length of json header, json header, padding, binary arrays
+COLUMNAR_MAGIC = b'RIDC'
+COLUMN_ALIGN = 8
+
+
+def _align(n):
+    return -n % COLUMN_ALIGN
+
+
+def pack_payload(jsd, blob=None):
+    """
+    Returns the bytes to write:  the json bytes as is, or if there is a binary blob of columns
+    the columnar layout.  Array offsets in the json are relative to the start of the blob.
+    """
+    if blob is None:
+        return jsd
+    header = COLUMNAR_MAGIC + struct.pack('<I', len(jsd)) + jsd
+    return header + b'\0' * _align(len(header)) + bytes(blob)
+
+
+def unpack_payload(payload):
+    """
+    Inverse of pack_payload, returns the parsed json and the blob (None if not columnar).
+    """
+    if payload[:len(COLUMNAR_MAGIC)] != COLUMNAR_MAGIC:
+        return json_loads(payload), None
+    start = len(COLUMNAR_MAGIC) + 4
+    jlen = struct.unpack('<I', payload[len(COLUMNAR_MAGIC):start])[0]
+    data = json_loads(payload[start:start + jlen])
+    start += jlen
+    start += _align(start)
+    return data, memoryview(payload)[start:]
+
+
+quantize_options = ('float16', 'int16')
+
+
+def check_quantize(quantize):
+    if quantize is not None and quantize not in quantize_options:
+        raise ValueError("Unknown quantize option {}".format(quantize))
+
+
+def write_column(val, dtype, blob, quantize=None):
+    """
+    Appends val as a binary array of dtype to blob and returns the json descriptor for it.
+    quantize may be:
+        'float16':  stored as float16 (~3 significant digits over a limited range, so meant
+                    for dB values - the largest magnitude must be within 6.1e-5 to 65504)
+        'int16':  stored as int16 steps of 'scale' about 'zero' (in the descriptor), which
+                  spans the range of val
+    Values to quantize must be finite, otherwise a ValueError is raised.
+    """
+    check_quantize(quantize)
+    arr = np.asarray(val, dtype=dtype)
+    quantized = {}
+    if quantize is not None and not np.all(np.isfinite(arr)):
+        raise ValueError("Can't quantize non-finite values to {}".format(quantize))
+    if quantize == 'float16':
+        mag = np.abs(arr).max() if arr.size else 0.0
+        f16 = np.finfo(np.float16)
+        if mag and not f16.tiny <= mag <= f16.max:
+            raise ValueError("Values are out of float16 range (use dB or int16)")
+        arr = arr.astype('<f2')
+    elif quantize == 'int16' and arr.size:
+        lo, hi = float(arr.min()), float(arr.max())
+        quantized['zero'] = (hi + lo) / 2.0
+        quantized['scale'] = (hi - lo) / 65534.0 if hi > lo else 1.0
+        arr = np.round((arr - quantized['zero']) / quantized['scale']).astype('<i2')
+    blob.extend(b'\0' * _align(len(blob)))
+    col = {'byte_offset': len(blob), 'dtype': arr.dtype.str, 'shape': list(arr.shape)}
+    col.update(quantized)
+    blob.extend(arr.tobytes())
+    return {'_col': col}
+
+
+def read_columns(fs, blob, as_arrays=False):
+    """
+    Replaces the column descriptors in feature_set dictionary fs with their values from blob.
+    These are lists, or if as_arrays ndarrays (views of blob unless int16 quantized).
+    """
+    for v, Y in six.iteritems(fs):
+        if isinstance(Y, dict) and '_col' in Y:
+            col = Y['_col']
+            count = int(np.prod(col['shape']))
+            if not count:
+                fs[v] = np.zeros(col['shape'], dtype=col['dtype']) if as_arrays else []
+                continue
+            arr = np.frombuffer(blob, dtype=col['dtype'], count=count, offset=col['byte_offset'])
+            if 'scale' in col:
+                arr = arr * col['scale'] + col['zero']
+            arr = arr.reshape(col['shape'])
+            fs[v] = arr if as_arrays else arr.tolist()
+    return fs
+
+
+def map_payload(filename):
+    """
+    Memory-maps an uncompressed columnar file and returns the json header and the blob (see
+    unpack_payload).  The arrays are then only read from disk when they are accessed.
+    """
+    with open(filename, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return unpack_payload(mm)
+
+
+compressed_extensions = ('ridz', 'ridz2')
+
+
+def is_compressed(filename):
+    return filename.split('.')[-1].lower() in compressed_extensions
+
+
+def is_columnar(filename):
+    """
+    Checks whether the file has the columnar layout (see pack_payload).
+    """
+    with rid_open(filename, 'rb') as f:
+        return f.read(len(COLUMNAR_MAGIC)) == COLUMNAR_MAGIC
+
+
+def stream_items(f):
+    """
+    Yields the top-level (key, value) pairs of the json in file f, parsed incrementally with
+    ijson so that the whole document is never in memory.  The feature_sets are yielded one
+    at a time as ('feature_sets', {feature_set_name: feature_set}).
+    """
+    builder = None
+    for prefix, event, value in ijson.parse(f, use_float=True):
+        if builder is None:
+            if event == 'map_key' and prefix == '':
+                key = value
+                continue
+            if event == 'map_key' and prefix == 'feature_sets':
+                fs_key = value
+                continue
+            if prefix == '' or (prefix == 'feature_sets' and event in ('start_map', 'end_map')):
+                continue
+            builder = ijson.ObjectBuilder()
+            is_feature_set = prefix != key
+            depth = 0
+        builder.event(event, value)
+        if event in ('start_map', 'start_array'):
+            depth += 1
+        elif event in ('end_map', 'end_array'):
+            depth -= 1
+        if not depth:
+            if is_feature_set:
+                yield 'feature_sets', {fs_key: builder.value}
+            else:
+                yield key, builder.value
+            builder = None
+
+
+def json_loads(s):
+    """
+    Parses a JSON document (str or bytes), using orjson if available.  orjson rejects the
+    NaN/Infinity literals that the json module writes, so those fall back to json.
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError:
+            pass
+    if isinstance(s, bytes):
+        s = s.decode('utf-8')
+    return json.loads(s)
+
+
+def json_dumps(ds, pretty=False):
+    """
+    Serializes ds to utf-8 encoded JSON bytes with sorted keys, using orjson if available.
+    If pretty it is indented, otherwise it is compact.
+    orjson writes NaN/Infinity as null, so if there is any null it is redone with json, which
+    writes them as NaN/Infinity (as read by json_loads).  Pretty output always uses json.
+    Either way numpy values go through _json_default, so they are written the same.
+    """
+    if orjson is not None and not pretty:
+        jsd = orjson.dumps(ds, option=orjson.OPT_SORT_KEYS, default=_json_default)
+        if b'null' not in jsd:
+            return jsd
+    if pretty:
+        return json.dumps(ds, sort_keys=True, indent=4, separators=(',', ':'),
+                          default=_json_default).encode('utf-8')
+    return json.dumps(ds, sort_keys=True, separators=(',', ':'), default=_json_default).encode('utf-8')
+
+
+_to_dict_cache = {}
+_identifier_re = re.compile(r'^[A-Za-z_]\w*$')
+
+
+def _attr_source(d):
+    if _identifier_re.match(d) and not keyword.iskeyword(d):
+        return 'self.' + d
+    return 'getattr(self, {!r})'.format(d)
+
+
+def header_to_dict(direct, unit):
+    """
+    Returns a function that builds the header dict of the direct and unit attributes of a
+    Rids object (skipping None), generated once per attribute set with the names written out.
+    """
+    key = (tuple(direct), tuple(unit))
+    if key not in _to_dict_cache:
+        lines = ["def _to_dict(self):", "    ds = {}"]
+        for d in key[0]:
+            lines += ["    val = {}".format(_attr_source(d)),
+                      "    if val is not None:",
+                      "        ds[{!r}] = val".format(d)]
+        for d in key[1]:
+            lines += ["    val = {}".format(_attr_source(d)),
+                      "    if val is not None:",
+                      "        ds[{!r}] = '{{}} {{}}'.format(val, {})".format(d, _attr_source(d + '_unit'))]
+        lines.append("    return ds")
+        namespace = {}
+        exec(compile('\n'.join(lines), '<rids header_to_dict>', 'exec'), namespace)
+        _to_dict_cache[key] = namespace['_to_dict']
+    return _to_dict_cache[key]
+
+
+def _json_default(x):
+    """
+    Serializes numpy arrays/scalars (e.g. feature_sets read from a memory-mapped file).
+    """
+    if isinstance(x, (np.ndarray, np.generic)):
+        return x.tolist()
+    raise TypeError("{} is not JSON serializable".format(type(x)))
+
+
+_unit_value_re = re.compile(r'^\s*(\S+)(?:\s+(\S+))?')
+_number_re = re.compile(r'^[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?$|^[-+]?(inf|infinity|nan)$', re.IGNORECASE)
+
+
+def get_unit_values(d, x):
+    """
+    Parses the "value unit" string x for unit attribute d, returning {d: value, d_unit: unit}.
+    value is a float if numeric and unit is None if missing.
+    """
+    d0, d1 = x, None
+    m = _unit_value_re.match(x) if isinstance(x, six.string_types) else None
+    if m is not None:
+        d0, d1 = m.groups()
+        if _number_re.match(d0):
+            d0 = float(d0)
+    return {d: d0, d + '_unit': d1}
+
+
 def set_unit_values(C, d, x):
-    v = x.split()
-    try:
-        d0 = float(v[0])
-    except ValueError:
-        d0 = v[0]
-    d1 = None
-    if len(v) > 1:
-        d1 = v[1]
-    setattr(C, d, d0)
-    setattr(C, d + '_unit', d1)
+    for a, b in six.iteritems(get_unit_values(d, x)):
+        setattr(C, a, b)
 
 
 def fix_json_list(jsd):
@@ -3,3 +3,6 @@
 # Licensed under the 2-clause BSD license.
 
 from . import test_sphandling
+from . import test_rids
+from . import test_peak_det
+from . import test_spectrum_peak
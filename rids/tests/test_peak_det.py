@@ -0,0 +1,65 @@
+# -*- mode: python; coding: utf-8 -*-
+# Copyright 2018 the HERA Collaboration
+# Licensed under the 2-clause BSD license.
+
+from __future__ import print_function, division, absolute_import
+
+import numpy as np
+
+from ..features import peak_det
+
+
+def _reference_peakdet(v, delta, threshold, x):
+    """
+    The original list-based peakdet loop.
+    """
+    thresholded_max_only = []
+    mn, mx = np.inf, -np.inf
+    mxpos = None
+    lookformax = True
+    for i in range(len(v)):
+        this = v[i]
+        if this > mx:
+            mx = this
+            mxpos = x[i]
+        if this < mn:
+            mn = this
+        if lookformax:
+            if this < mx - delta:
+                if threshold is None or mx > threshold:
+                    thresholded_max_only.append(mxpos)
+                mn = this
+                lookformax = False
+        else:
+            if this > mn + delta:
+                mx = this
+                mxpos = x[i]
+                lookformax = True
+    return thresholded_max_only
+
+
+def test_peakdet_known():
+    v = [0.0, 1.0, 5.0, 1.0, 0.0, 3.0, 0.5, 0.0, 8.0, 7.5, 0.0]
+    assert peak_det.peakdet(v, 2.0, None) == [2, 5, 8]
+    assert peak_det.peakdet(v, 2.0, 4.0) == [2, 8]
+    assert peak_det.peakdet(v, 2.0, 4.0, x=[10.0 * i for i in range(len(v))]) == [20.0, 80.0]
+    assert peak_det.peakdet(v, 2.0, 10.0) == []
+    assert peak_det.peakdet([1.0, 1.0, 1.0], 0.5, None) == []
+    assert peak_det.peakdet([], 0.5, None) == []
+
+
+def test_peakdet_reference():
+    rng = np.random.RandomState(1)
+    freq = np.linspace(50.0, 250.0, 2000)
+    v = -40.0 + rng.randn(freq.size)
+    for c in [60.0, 100.0, 180.0]:
+        v += 30.0 * np.exp(-0.5 * ((freq - c) / 0.5) ** 2)
+    # The compiled loop (if numba is installed) and the plain python one
+    loops = [peak_det._peakdet, getattr(peak_det._peakdet, 'py_func', peak_det._peakdet)]
+    for delta in [0.5, 2.0, 10.0]:
+        for threshold in [None, -38.0, -20.0, 100.0]:
+            expected = _reference_peakdet(v, delta, threshold, freq)
+            assert peak_det.peakdet(v, delta, threshold, x=freq) == expected
+            th = -np.inf if threshold is None else threshold
+            for loop in loops:
+                assert list(freq[loop(v, delta, th)]) == expected
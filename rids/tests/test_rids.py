@@ -0,0 +1,304 @@
+# -*- mode: python; coding: utf-8 -*-
+# Copyright 2018 the HERA Collaboration
+# Licensed under the 2-clause BSD license.
+
+from __future__ import print_function, division, absolute_import
+
+import os
+import shutil
+import tempfile
+import numpy as np
+
+from .. import features, rids
+
+test_file = 'sa_Spectrum_Peak.20180526-1033.n40.maxT-20.ridz'
+
+
+def _write_and_read(rid, filename, **kwargs):
+    tmpdir = tempfile.mkdtemp()
+    try:
+        fn = os.path.join(tmpdir, filename)
+        rid.writer(fn, **kwargs)
+        rid2 = features.spectrum_peak.SpectrumPeak()
+        rid2.reader(fn)
+    finally:
+        shutil.rmtree(tmpdir)
+    return rid2
+
+
+def test_columnar_roundtrip():
+    rid = features.spectrum_peak.SpectrumPeak()
+    rid.reader(test_file)
+    rid2 = _write_and_read(rid, 'columnar.ridz', columnar=True)
+    assert sorted(rid.feature_sets.keys()) == sorted(rid2.feature_sets.keys())
+    for k, fs in rid.feature_sets.items():
+        fs2 = rid2.feature_sets[k]
+        assert isinstance(fs2.freq, list)
+        assert np.allclose(fs.freq, fs2.freq)
+        for fc in ['bw', 'maxhold', 'minhold', 'val']:
+            if hasattr(fs, fc):
+                assert np.allclose(getattr(fs, fc), getattr(fs2, fc), atol=1E-4)
+
+
+def test_quantized_roundtrip():
+    rid = features.spectrum_peak.SpectrumPeak()
+    rid.reader(test_file)
+    for quantize, rtol in [('float16', 1E-3), ('int16', 1E-4)]:
+        rid2 = _write_and_read(rid, 'quantized.ridz', quantize=quantize)
+        for k, fs in rid.feature_sets.items():
+            fs2 = rid2.feature_sets[k]
+            assert np.allclose(fs.freq, fs2.freq)
+            for fc in ['maxhold', 'minhold', 'val']:
+                if hasattr(fs, fc):
+                    x = np.array(getattr(fs, fc))
+                    atol = rtol * max(np.ptp(x), np.abs(x).max())
+                    assert np.allclose(x, getattr(fs2, fc), atol=atol)
+
+
+def test_quantize_errors():
+    rid = features.spectrum_peak.SpectrumPeak()
+    rid.reader(test_file)
+    k = sorted(rid.feature_sets.keys())[0]
+    for quantize, maxhold in [('float32', None),
+                              ('int16', [float('-inf'), -90.0]),
+                              ('float16', [float('nan'), -90.0]),
+                              ('float16', [1E-9, 2E-9])]:
+        if maxhold is not None:
+            rid.feature_sets[k].maxhold = maxhold
+        try:
+            _write_and_read(rid, 'bad.ridz', quantize=quantize)
+        except ValueError:
+            continue
+        raise AssertionError("quantize={} of {} should fail".format(quantize, maxhold))
+
+
+def test_compact_roundtrip():
+    rid = features.spectrum_peak.SpectrumPeak()
+    rid.reader(test_file)
+    for columnar in [False, True]:
+        rid2 = _write_and_read(rid, 'compact.rids', compact=True, columnar=columnar)
+        assert sorted(rid.feature_sets.keys()) == sorted(rid2.feature_sets.keys())
+        for k, fs in rid.feature_sets.items():
+            fs2 = rid2.feature_sets[k]
+            for fc in rid.feature_components:
+                assert hasattr(fs, fc) == hasattr(fs2, fc)
+            assert fs.comment == fs2.comment
+            assert np.allclose(fs.freq, fs2.freq)
+
+
+def test_stream_reader():
+    rid = features.spectrum_peak.SpectrumPeak()
+    rid.reader(test_file)
+    rid.comment = 'streamed'
+    k0 = sorted(rid.feature_sets.keys())[0]
+    for nonfinite in [False, True]:
+        if nonfinite:  # ijson can't parse these, so falls back to reading it all
+            rid.feature_sets[k0].maxhold = [float('nan'), float('-inf'), -90.0]
+        for fn, compact, pretty in [('stream.ridz', False, False), ('stream.ridz', True, False),
+                                    ('stream.rids', False, True)]:
+            rid2 = features.spectrum_peak.SpectrumPeak()
+            rid2.stream_size = -1
+            tmpdir = tempfile.mkdtemp()
+            try:
+                fn = os.path.join(tmpdir, fn)
+                rid.writer(fn, compact=compact, pretty=pretty)
+                rid2.reader(fn)
+            finally:
+                shutil.rmtree(tmpdir)
+            assert rid2.threshold == rid.threshold
+            assert rid2.comment == rid.comment
+            assert sorted(rid.feature_sets.keys()) == sorted(rid2.feature_sets.keys())
+            for k, fs in rid.feature_sets.items():
+                for fc in rid.feature_components:
+                    # repr so that nan matches
+                    assert repr(getattr(fs, fc, None)) == repr(getattr(rid2.feature_sets[k], fc, None))
+
+
+def test_mmap_reader():
+    rid = features.spectrum_peak.SpectrumPeak()
+    rid.reader(test_file)
+    tmpdir = tempfile.mkdtemp()
+    try:
+        fn = os.path.join(tmpdir, 'mapped.rids')
+        rid.writer(fn, columnar=True)
+        rid2 = features.spectrum_peak.SpectrumPeak()
+        rid2.reader(fn, as_arrays=True)
+        # ...and write it back out from the arrays
+        fn2 = os.path.join(tmpdir, 'rewritten.rids')
+        rid2.writer(fn2)
+        rid3 = features.spectrum_peak.SpectrumPeak()
+        rid3.reader(fn2)
+        # lists unless as_arrays
+        rid4 = features.spectrum_peak.SpectrumPeak()
+        rid4.reader(fn)
+    finally:
+        shutil.rmtree(tmpdir)
+    for k, fs in rid.feature_sets.items():
+        fs2 = rid2.feature_sets[k]
+        assert isinstance(fs2.freq, np.ndarray)
+        assert isinstance(rid4.feature_sets[k].freq, list)
+        assert np.allclose(fs.freq, fs2.freq)
+        assert np.allclose(fs.freq, rid3.feature_sets[k].freq)
+        assert np.allclose(fs.freq, rid4.feature_sets[k].freq)
+        if hasattr(fs, 'maxhold'):
+            assert np.allclose(fs.maxhold, fs2.maxhold, atol=1E-4)
+
+
+def test_header_to_dict():
+    rid = features.spectrum_peak.SpectrumPeak()
+    rid.reader(test_file)
+    rid.append_comment('more')
+    direct = rid.direct_attributes + rid.sp__direct_attributes
+    unit = rid.unit_attributes + rid.sp__unit_attributes
+    to_dict = rids.header_to_dict(direct, unit)
+    assert to_dict is rids.header_to_dict(direct, unit)
+    ds = to_dict(rid)
+    for d in direct:
+        assert ds.get(d) == getattr(rid, d)
+    for d in unit:
+        if getattr(rid, d) is None:
+            assert d not in ds
+        else:
+            assert ds[d] == "{} {}".format(getattr(rid, d), getattr(rid, d + '_unit'))
+
+    # names that aren't usable as python attributes are looked up with getattr
+    class Odd(object):
+        pass
+    odd = Odd()
+    setattr(odd, 'class', 'a')
+    setattr(odd, 'b-c', None)
+    setattr(odd, 'lambda', 3.0)
+    setattr(odd, 'lambda_unit', 'm')
+    assert rids.header_to_dict(('class', 'b-c'), ('lambda',))(odd) == {'class': 'a', 'lambda': '3.0 m'}
+
+
+def test_nonfinite_roundtrip():
+    rid = features.spectrum_peak.SpectrumPeak()
+    rid.reader(test_file)
+    k = sorted(rid.feature_sets.keys())[0]
+    rid.feature_sets[k].maxhold = [float('nan'), float('-inf'), -90.0]
+    for pretty in [False, True]:
+        rid2 = _write_and_read(rid, 'nonfinite.ridz', pretty=pretty)
+        maxhold = rid2.feature_sets[k].maxhold
+        assert np.isnan(maxhold[0])
+        assert maxhold[1:] == [float('-inf'), -90.0]
+
+
+def test_ridz2_roundtrip():
+    if rids.zstd is None:  # zstandard is optional
+        return
+    rid = features.spectrum_peak.SpectrumPeak()
+    rid.reader(test_file)
+    for columnar in [False, True]:
+        rid2 = _write_and_read(rid, 'zstd.ridz2', columnar=columnar)
+        assert sorted(rid.feature_sets.keys()) == sorted(rid2.feature_sets.keys())
+        for k, fs in rid.feature_sets.items():
+            fs2 = rid2.feature_sets[k]
+            for fc in rid.feature_components:
+                assert hasattr(fs, fc) == hasattr(fs2, fc)
+            assert np.allclose(fs.freq, fs2.freq)
+            for fc in ['maxhold', 'minhold', 'val']:
+                if hasattr(fs, fc):
+                    assert np.allclose(getattr(fs, fc), getattr(fs2, fc), atol=1E-4)
+
+
+def test_set_unit_values():
+    rid = rids.Rids()
+    rid.set(channel_width='0.33 MHz', instrument='sa')
+    assert rid.channel_width == 0.33
+    assert rid.channel_width_unit == 'MHz'
+    assert rid.instrument == 'sa'
+    assert rids.get_unit_values('time_constant', 'ongoing maxhold') == {'time_constant': 'ongoing',
+                                                                        'time_constant_unit': 'maxhold'}
+    assert rids.get_unit_values('freq', '-1.5e2') == {'freq': -150.0, 'freq_unit': None}
+    assert rids.get_unit_values('freq', 'MHz') == {'freq': 'MHz', 'freq_unit': None}
+    assert rids.get_unit_values('freq', 3.0) == {'freq': 3.0, 'freq_unit': None}
+    assert rids.get_unit_values('freq', '') == {'freq': '', 'freq_unit': None}
+
+
+def test_compresslevel():
+    rid = features.spectrum_peak.SpectrumPeak()
+    rid.reader(test_file)
+    levels = [('ridz', 0, 9, 10)]
+    if rids.zstd is not None:  # zstandard is optional
+        levels.append(('ridz2', 1, 19, 100))
+    tmpdir = tempfile.mkdtemp()
+    try:
+        for ext, lo, hi, bad in levels:
+            sizes = []
+            for level in [lo, hi]:
+                fn = os.path.join(tmpdir, 'level{}.{}'.format(level, ext))
+                rid.writer(fn, compresslevel=level)
+                sizes.append(os.path.getsize(fn))
+                rid2 = features.spectrum_peak.SpectrumPeak()
+                rid2.reader(fn)
+                assert sorted(rid.feature_sets.keys()) == sorted(rid2.feature_sets.keys())
+            assert sizes[0] > sizes[1]
+            # a bad level fails before the existing file is touched
+            try:
+                rid.writer(fn, compresslevel=bad)
+            except ValueError:
+                pass
+            else:
+                raise AssertionError("compresslevel={} should fail".format(bad))
+            assert os.path.getsize(fn) == sizes[1]
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+def test_json_without_orjson():
+    rid = features.spectrum_peak.SpectrumPeak()
+    rid.reader(test_file)
+    tmpdir = tempfile.mkdtemp()
+    orjson = rids.orjson
+    try:
+        fn = os.path.join(tmpdir, 'columnar.rids')
+        rid.writer(fn, columnar=True)
+        rid2 = features.spectrum_peak.SpectrumPeak()
+        rid2.reader(fn, as_arrays=True)  # float32 arrays
+        fn_orjson = os.path.join(tmpdir, 'orjson.rids')
+        rid2.writer(fn_orjson)
+        rids.orjson = None
+        fn_json = os.path.join(tmpdir, 'json.rids')
+        rid2.writer(fn_json)
+        with open(fn_orjson, 'rb') as f1, open(fn_json, 'rb') as f2:
+            assert rids.json_loads(f1.read()) == rids.json_loads(f2.read())
+    finally:
+        rids.orjson = orjson
+        shutil.rmtree(tmpdir)
+
+
+def test_rewrite_mapped_file():
+    rid = features.spectrum_peak.SpectrumPeak()
+    rid.reader(test_file)
+    tmpdir = tempfile.mkdtemp()
+    try:
+        fn = os.path.join(tmpdir, 'mapped.rids')
+        rid.writer(fn, columnar=True)
+        rid2 = features.spectrum_peak.SpectrumPeak()
+        rid2.reader(fn, as_arrays=True)
+        maxhold = {k: np.array(fs.maxhold) for k, fs in rid2.feature_sets.items() if hasattr(fs, 'maxhold')}
+        rid2.writer(fn, columnar=True, quantize='float16')
+        for k, x in maxhold.items():
+            assert np.array_equal(rid2.feature_sets[k].maxhold, x)
+        assert os.listdir(tmpdir) == ['mapped.rids']
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+def test_append_comment():
+    # Same as appending '\n' + comment to the whole comment and stripping it each time
+    for comment, appends, expected in [(None, [None], None),
+                                       (None, [' a '], 'a'),
+                                       ('', ['  '], ''),
+                                       ('', ['  ', ' b '], 'b'),
+                                       (' x ', [], ' x '),
+                                       (' x ', ['b'], 'x \nb'),
+                                       (' x ', ['  '], 'x'),
+                                       ('q', [None, 'b\n', 'c'], 'q\nb\nc'),
+                                       ('q', ['b\n', '  '], 'q\nb'),
+                                       ('  ', ['\n c'], 'c')]:
+        rid = rids.Rids(comment=comment)
+        for c in appends:
+            rid.append_comment(c)
+        assert rid.comment == expected
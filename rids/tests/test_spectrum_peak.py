@@ -0,0 +1,71 @@
+# -*- mode: python; coding: utf-8 -*-
+# Copyright 2018 the HERA Collaboration
+# Licensed under the 2-clause BSD license.
+
+from __future__ import print_function, division, absolute_import
+
+import os
+import shutil
+import tempfile
+import numpy as np
+import matplotlib.pyplot as plt
+
+from .. import features
+
+test_file = 'sa_Spectrum_Peak.20180526-1033.n40.maxT-20.ridz'
+
+
+def _write_spectrum_files(directory, ntimes=4, npts=500):
+    rng = np.random.RandomState(0)
+    freq = np.linspace(50.0, 250.0, npts)
+    for t in range(ntimes):
+        ts = '20180101-00{:02d}'.format(t)
+        for pol in ['E', 'N']:
+            base = -40.0 + rng.randn(npts)
+            for c in [60.0, 100.0, 180.0]:
+                base += 30.0 * np.exp(-0.5 * ((freq - c - t) / 0.5) ** 2)
+            for fc, off in [('maxhold', 3.0), ('minhold', -3.0), ('val', 0.0)]:
+                with open(os.path.join(directory, 'sa.{}.{}.{}'.format(ts, fc, pol)), 'w') as f:
+                    for x, y in zip(freq, base + off):
+                        f.write('{} {}\n'.format(x, y))
+
+
+def _process(max_workers):
+    tmpdir = tempfile.mkdtemp()
+    try:
+        _write_spectrum_files(tmpdir)
+        rid = features.spectrum_peak.SpectrumPeak()
+        rid.threshold = -20.0
+        rid.bw_range = [-2.0, 2.0]
+        rid.process_files(directory=tmpdir, data=[0], max_workers=max_workers)
+        ridz = [x for x in os.listdir(tmpdir) if x.endswith('.ridz')]
+        assert len(ridz) == 1
+        assert len(os.listdir(tmpdir)) == 1  # spectrum files were deleted
+        rid2 = features.spectrum_peak.SpectrumPeak()
+        rid2.reader(os.path.join(tmpdir, ridz[0]))
+    finally:
+        shutil.rmtree(tmpdir)
+    return ridz[0], rid2
+
+
+def test_threaded_process_files():
+    fn1, serial = _process(max_workers=1)
+    fn4, threaded = _process(max_workers=4)
+    assert fn1 == fn4
+    assert serial.nsets == threaded.nsets == 10
+    assert (serial.fmin, serial.fmax) == (threaded.fmin, threaded.fmax)
+    assert sorted(serial.feature_sets.keys()) == sorted(threaded.feature_sets.keys())
+    for k, fs in serial.feature_sets.items():
+        fs2 = threaded.feature_sets[k]
+        for fc in serial.feature_components:
+            assert getattr(fs, fc, None) == getattr(fs2, fc, None)
+
+
+def test_viewer():
+    plt.switch_backend('Agg')
+    rid = features.spectrum_peak.SpectrumPeak()
+    rid.reader(test_file)
+    rid.viewer()
+    rid.viewer(show_components=['val'])
+    rid.viewer(threshold=rid.threshold + 10.0, show_data=False)
+    plt.close('all')
@@ -24,6 +24,7 @@ CLASSIFIERS = ["Development Status :: 3 - Alpha",
                "License :: OSI Approved :: MIT License",
                "Operating System :: OS Independent",
                "Programming Language :: Python",
+               "Programming Language :: Python :: 3",
                "Topic :: Scientific/Engineering"]
 
 # Description should be a one-liner:
@@ -70,3 +71,4 @@ SCRIPTS = [p for p in glob.glob('scripts/*') if not p.endswith('~')]
 #     ]
 # }
 REQUIRES = ["numpy", "matplotlib", "astropy"]
+PYTHON_REQUIRES = ">=3.6"  # concurrent.futures, os.scandir context manager
@@ -38,6 +38,10 @@ ap.add_argument('--show_progress', help="print file name as processed", action='
 ap.add_argument('--data_only', help="flag to only store data and not peaks", action='store_true')
 ap.add_argument('--ecal', help="E-pol cal filename", default=None)
 ap.add_argument('--ncal', help="N-pol cal filename", default=None)
+ap.add_argument('--columnar', help="write spectra as binary arrays (smaller/faster, not human-readable)", action='store_true')
+ap.add_argument('--compact', help="use single letter feature_component names in the file", action='store_true')
+ap.add_argument('--quantize', help="store spectra values as 'float16' or 'int16' (implies --columnar)", choices=['float16', 'int16'], default=None)
+ap.add_argument('--file_type', help="extension/compression of written files ('ridz2' needs zstandard)", choices=['ridz', 'ridz2', 'rids'], default='ridz')
 
 # parameters only used in viewing info on existing
 ap.add_argument('--show_fc', help="csv list of feature components to show (if different)", default='all')
@@ -86,8 +90,8 @@ if __name__ == '__main__':
         for k in r.feature_sets.keys():
             if args.comment is None:
                 s = '['
-                for x in dir(r.feature_sets[k]):
-                    if x[0] != '_':
+                for x in sorted(r.feature_components):
+                    if hasattr(r.feature_sets[k], x):
                         s += '{}, '.format(x)
                 s = s.strip().strip(',') + ']'
                 print("\t{}  {}".format(k, s))
@@ -108,4 +112,8 @@ if __name__ == '__main__':
                         data_only=args.data_only,
                         sets_per_pol=args.sets_per_pol,
                         keep_data=args.keep_data,
-                        show_progress=args.show_progress)
+                        show_progress=args.show_progress,
+                        columnar=args.columnar,
+                        quantize=args.quantize,
+                        compact=args.compact,
+                        file_type=args.file_type)
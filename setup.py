@@ -25,7 +25,8 @@ setup_args = dict(name=NAME,
                   packages=PACKAGES,
                   # package_data=PACKAGE_DATA,
                   scripts=SCRIPTS,
-                  requires=REQUIRES)
+                  requires=REQUIRES,
+                  python_requires=PYTHON_REQUIRES)
 
 
 if __name__ == '__main__':